@@ -1,27 +1,30 @@
 #!/usr/bin/env python3
-import netmiko  # type: ignore
+import atexit
 import re
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 import click  # type: ignore
 import datetime
-import json
-import yaml  # type: ignore
+import orjson  # type: ignore
 import os
-from time import sleep
-from functools import partial
-from ntc_templates.parse import parse_output  # type: ignore
+from time import sleep, time
+from functools import partial, lru_cache
 from typing import (
     Optional,
     Dict,
     TypedDict,
     List,
+    Tuple,
     Literal,
     Callable,
     Pattern,
     Match,
     get_args,
-    no_type_check,
 )
-from slack_sdk import WebClient  # type: ignore
+
+# netmiko, yaml and slack_sdk are imported lazily in the functions that need
+# them; together they add hundreds of ms of import time that the common
+# cached-view path never needs to pay
 
 HOSTNAME = "route-views.routeviews.org"
 USERNAME = "rviews"
@@ -40,10 +43,37 @@ PREFIX_TRANSLATE = {
 }
 
 
+_upload_executor: Optional[ThreadPoolExecutor] = None
+
+
+def _get_upload_executor() -> ThreadPoolExecutor:
+    """
+    Lazily create the single worker used for background slack uploads,
+    registered with atexit so pending uploads finish before the process exits
+    """
+    global _upload_executor
+    if _upload_executor is None:
+        _upload_executor = ThreadPoolExecutor(max_workers=1)
+        atexit.register(_upload_executor.shutdown, wait=True)
+    return _upload_executor
+
+
+def _report_upload_failure(future) -> None:
+    """
+    Done-callback that surfaces exceptions from background uploads, which the
+    executor would otherwise swallow silently
+    """
+    exception = future.exception()
+    if exception:
+        print(f"Failed to post to slack: {exception}")
+
+
 def post_to_channel(channel: str, path: str, comment: str) -> None:
     """
     Common function for posting a file to a slack channel
     """
+    from slack_sdk import WebClient  # type: ignore
+
     assert os.environ.get(
         "SLACK_API_TOKEN"
     ), "The 'SLACK_API_TOKEN' environment variable must be set"
@@ -65,197 +95,331 @@ class RouteView:
         self,
         hostname: str,
         username: str,
-        asn: str,
+        asns: Tuple[str, ...],
         intent_file: str,
         refresh: bool = False,
     ):
         self.hostname = hostname
         self.username = username
-        self.asn = asn
+        self.asns = asns
         self.refresh = refresh
         self.view = self._get_view()
         self.intent_file = intent_file
-        self.intent = yaml.safe_load(open(intent_file))
+        raw_intent = self._load_intent(intent_file)
+        # AS path order is an artifact of how the view was parsed, so compare
+        # intent against reality as sets
+        self.intent = {prefix: frozenset(path) for prefix, path in raw_intent.items()}
 
-    def _view_from_route_server(self) -> None:
+    @staticmethod
+    def _load_intent(intent_file: str) -> Dict[str, List[int]]:
+        """
+        Load the intent file through a JSON cache kept next to the YAML. JSON
+        parses far faster than YAML, so repeated invocations only pay the YAML
+        parse when the intent file has actually changed.
         """
-        Query view from route server and write to log file
+        json_cache = intent_file + ".json"
+        try:
+            if os.path.getmtime(json_cache) >= os.path.getmtime(intent_file):
+                with open(json_cache, "rb") as file:
+                    return orjson.loads(file.read())
+        except (OSError, orjson.JSONDecodeError):
+            # a missing or corrupt cache just means we parse the YAML
+            pass
+        import yaml  # type: ignore
+
+        # prefer the libyaml C loader when available, it is several times faster
+        loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+        with open(intent_file, "rb") as file:
+            intent = yaml.load(file, Loader=loader)
+        try:
+            # write the cache to a temp file and rename it into place so a
+            # torn write can never leave a half-written cache behind
+            tmp_cache = json_cache + ".tmp"
+            with open(tmp_cache, "wb") as file:
+                file.write(orjson.dumps(intent))
+            os.replace(tmp_cache, json_cache)
+        except OSError:
+            # a read-only intent directory just means no cache
+            pass
+        return intent
+
+    # one row of 'show ip bgp' table output: an optional RPKI validation code
+    # and variable-width status flags, then the network (blank on extra paths
+    # for the same network) and next hop. The right-aligned metric/locprf
+    # columns keep a 2+ space gap from the weight, while weight, AS path and
+    # origin code are single-spaced, which is what tells them apart.
+    BGP_ROW_RE = re.compile(
+        r"^\s*[NVI]?[*>sdhirSmbfxac]+\s*"
+        r"(?:(?P<network>\d\S*)\s+)?"
+        r"(?:\d{1,3}\.){3}\d{1,3}"
+        r"(?:\s{2,}\d+)*?"
+        r"\s+(?P<weight_path>\d+(?: \S+)*) (?P<origin>[ie?])\s*$"
+    )
+
+    @staticmethod
+    def _parse_bgp_table(output: str) -> List[Dict[str, str]]:
         """
+        Minimal parser for cisco 'show ip bgp' table output, extracting only
+        the network and AS path columns we actually use. Replaces the TextFSM
+        template pass, which parsed a dozen fields just to throw them away.
+        """
+        rows: List[Dict[str, str]] = []
+        network = ""
+        for line in output.splitlines():
+            match = RouteView.BGP_ROW_RE.match(line)
+            if not match:
+                continue
+            # extra paths for the same network leave the network column blank
+            if match.group("network"):
+                network = match.group("network")
+            # the first token of the single-spaced tail is the weight, the
+            # rest is the AS path
+            weight_path = match.group("weight_path").split(" ", 1)
+            as_path = weight_path[1] if len(weight_path) > 1 else ""
+            rows.append({"network": network, "as_path": as_path})
+        return rows
+
+    # serve the cached view for this long before fetching a new one
+    VIEW_MAX_AGE = 8 * 3600
+
+    def _connect(self):
+        """
+        Open a new connection to the route server, retrying on auth failures
+        """
+        import netmiko  # type: ignore
+
         retry = 5
-        success = False
-        while not success and retry >= 1:
+        while retry >= 1:
             try:
-                self.connection = netmiko.ConnectHandler(
+                return netmiko.ConnectHandler(
                     host=self.hostname,
                     username=self.username,
                     device_type="cisco_ios_telnet",
                 )
-                success = True
             except netmiko.exceptions.NetmikoAuthenticationException:
                 sleep(3)
                 retry -= 1
                 continue
-        if not success:
-            raise RuntimeError("Error logging into route-views after 5 attempts")
-        output = re.sub(
-            "\n[NV]",
-            "\n",
-            self.connection.send_command(
-                f"show ip bgp regexp _{self.asn}", read_timeout=120
-            ),
-        )
-        parsed = parse_output(platform="cisco_ios", command="show ip bgp", data=output)
-        timestamp = datetime.datetime.now().isoformat()
-        # sort list of prefixes so we get a consistent diff
-        prefix_list = [item["network"] for item in parsed]
-        prefix_list.sort()
-        # define data with keys from sorted list
-        data: Dict[str, List[int]] = {prefix: [] for prefix in prefix_list}
-        # populate values with AS numbers
-        for item in parsed:
-            pattern = re.compile(f"(\w+) {self.asn}")  # type: Pattern[str]
-            match = pattern.search(item["as_path"])  # type: Optional[Match[str]]
-            if isinstance(match, re.Match):
-                data[item["network"]].append(int(str(match.groups()[0])))
-
-        # cast paths to dict keys and back to list to remove duplicates
-        for network, path in data.items():
-            path.sort()
-            data[network] = list(dict.fromkeys(path))
-
-        report = {"timestamp": timestamp, "contents": data}
-
-        with open(FILENAME, "a") as file:
-            file.write(f"{json.dumps(report)}\n")
-
-    # ignore type checking here since we work around the variability of the return value
-    # in code
-    @no_type_check
-    def _view_from_file(self) -> View:
+        raise RuntimeError("Error logging into route-views after 5 attempts")
+
+    def _query_asn(self, asn: str) -> List[Dict[str, str]]:
         """
-        Read latest view from log file
+        Run the BGP query for one ASN over its own connection and return the
+        parsed rows. A dedicated connection per query lets queries for
+        different ASNs run in parallel threads.
         """
+        connection = self._connect()
+        try:
+            output = connection.send_command(
+                f"show ip bgp regexp _{asn}", read_timeout=120
+            )
+        finally:
+            connection.disconnect()
+        return self._parse_bgp_table(output)
 
-        def _read_file() -> Optional[View]:
-            """
-            Small wrapper for file reading, mostly to allow for calling twice in a row
-            if first run returns None.
-            """
-            with open(FILENAME, "r") as file:
-                lines = file.readlines()
-                if not lines:
-                    return None
-                latest_view_str = lines[-1]
-                latest_view = json.loads(latest_view_str)
-                return latest_view
-
-        if not os.path.exists(FILENAME):
-            self._view_from_route_server()
-
-        latest_view = _read_file()
-        if not latest_view:
-            self._view_from_route_server()
-            latest_view = _read_file()
-        return latest_view
+    def _view_from_route_server(self) -> View:
+        """
+        Query view for each ASN from route server, write combined view to log
+        file and return it. Several ASNs are queried in parallel over
+        dedicated connections.
+        """
+        if len(self.asns) > 1:
+            # a netmiko session can only run one command at a time, so give
+            # each ASN its own connection and run the queries in parallel;
+            # wall-clock time stays at roughly one query instead of N
+            with ThreadPoolExecutor(max_workers=min(8, len(self.asns))) as pool:
+                parsed_by_asn = dict(
+                    zip(self.asns, pool.map(self._query_asn, self.asns))
+                )
+        else:
+            parsed_by_asn = {asn: self._query_asn(asn) for asn in self.asns}
+        timestamp = datetime.datetime.now().isoformat()
+        # collect AS numbers per prefix in a single pass over the parsed rows
+        raw: Dict[str, List[int]] = defaultdict(list)
+        for asn, parsed in parsed_by_asn.items():
+            pattern = re.compile(rf"(\w+)\s+{re.escape(asn)}\b")  # type: Pattern[str]
+            for item in parsed:
+                match = pattern.search(item["as_path"])  # type: Optional[Match[str]]
+                if isinstance(match, re.Match):
+                    raw[item["network"]].append(int(match.group(1)))
+
+        # sort prefixes so we get a consistent diff, dedup and sort paths
+        data = {network: sorted(set(raw[network])) for network in sorted(raw)}
+
+        report: View = {"timestamp": timestamp, "contents": data}
+
+        # unbuffered binary append with a single write call so each record hits
+        # the log as one complete line, keeping the tail reader safe from
+        # partial records
+        with open(FILENAME, "ab", buffering=0) as file:
+            file.write(orjson.dumps(report) + b"\n")
+        return report
+
+    def _view_from_file(self) -> Optional[View]:
+        """
+        Read latest view from log file, or None if the file is missing, empty
+        or holds no complete record. Reads only the tail of the log so memory
+        and I/O stay constant as the snapshot history grows.
+        """
+        try:
+            file = open(FILENAME, "rb")
+        except FileNotFoundError:
+            return None
+        with file:
+            file.seek(0, os.SEEK_END)
+            size = file.tell()
+            if size == 0:
+                return None
+            # read a window from the end of the file, doubling it until the
+            # window contains the start of the last complete line
+            window = 8192
+            while True:
+                file.seek(max(0, size - window))
+                block = file.read()
+                # only lines terminated by a newline are complete records; a
+                # missing trailing newline means the last write was torn, so
+                # fall back to the preceding complete line
+                if block.endswith(b"\n"):
+                    end = len(block) - 1
+                else:
+                    end = block.rfind(b"\n")
+                if end == -1:
+                    if window >= size:
+                        return None
+                    window *= 2
+                    continue
+                start = block.rfind(b"\n", 0, end)
+                if start != -1 or window >= size:
+                    break
+                window *= 2
+            latest_view_bytes = block[start + 1 : end + 1]
+            if not latest_view_bytes.strip():
+                return None
+            try:
+                latest_view: View = orjson.loads(latest_view_bytes)
+            except orjson.JSONDecodeError:
+                # a corrupt record just means the caller fetches a fresh view
+                return None
+            return latest_view
 
     def _get_view(self) -> View:
         """
-        Builds route view and returns standardized model
+        Builds route view and returns standardized model. Uses the cached view
+        from the log file unless it is missing, stale or a refresh is forced.
+        Staleness is judged from the log's mtime so a stale cache is detected
+        with a single stat, before the file is ever opened.
         """
+        if self.refresh:
+            return self._view_from_route_server()
+        try:
+            stat = os.stat(FILENAME)
+        except FileNotFoundError:
+            return self._view_from_route_server()
+        if time() - stat.st_mtime > self.VIEW_MAX_AGE:
+            return self._view_from_route_server()
         latest_view = self._view_from_file()
-        if not latest_view or self.refresh:
-            self._view_from_route_server()
-        else:
-            view_time = datetime.datetime.fromisoformat(latest_view["timestamp"])
-            time_now = datetime.datetime.now()
-            if view_time < (time_now - datetime.timedelta(hours=8)):
-                self._view_from_route_server()
-        return self._view_from_file()
+        if not latest_view:
+            return self._view_from_route_server()
+        return latest_view
 
     @staticmethod
-    def _get_path(path: List[int]) -> str:
+    @lru_cache(maxsize=1024)
+    def _get_path(path: Tuple[int, ...]) -> str:
         """
-        Build string path from set
+        Build string path from tuple, cached since many prefixes share the
+        same upstream path
         """
+        peer_tx = PEER_TRANSLATE
         return ", ".join(
             [
-                f"{path} ({PEER_TRANSLATE[path]})"
-                if path in PEER_TRANSLATE
-                else f"{path} (UNKNOWN AS)"
-                for path in path
+                f"{asn} ({peer_tx[asn]})" if asn in peer_tx else f"{asn} (UNKNOWN AS)"
+                for asn in path
             ]
         )
 
     def view_to_slack(
-        self, channel: str, content: str, alerts_only: bool = True
+        self,
+        channel: str,
+        content: str,
+        alerts_only: bool = True,
+        critical: bool = False,
     ) -> None:
         """
         Write view to file and upload to slack channel, takes content argument so that
-        various formats can be supplied and alerts_only to suppress OK state when run
-        from schedule
+        various formats can be supplied, alerts_only to suppress OK state when run
+        from schedule and critical so the caller reports alert state directly
+        instead of this method scanning the content for it
         """
-        if not "CRITICAL" in content and alerts_only:
+        if alerts_only and not critical:
             return
         filename = f"/tmp/{datetime.datetime.now().isoformat()}_route_view.txt"
         with open(filename, "w") as file:
             file.write(content)
-        post_to_channel(channel, filename, "route-view")
+        # upload in the background so the slow HTTPS POST does not block the
+        # rest of the run; atexit waits for it before the process exits
+        future = _get_upload_executor().submit(
+            post_to_channel, channel, filename, "route-view"
+        )
+        future.add_done_callback(_report_upload_failure)
 
     def verbose_view(self) -> str:
         """
         Print method for verbose
         """
-        output = ""
+        parts = []
+        prefix_get = PREFIX_TRANSLATE.get
         for prefix, path in self.view["contents"].items():
-            string_path = self._get_path(path)
-            output += (
-                f"Prefix {prefix} ({PREFIX_TRANSLATE.get(prefix)}) is "
+            string_path = self._get_path(tuple(path))
+            parts.append(
+                f"Prefix {prefix} ({prefix_get(prefix)}) is "
                 f"accessible via next hop AS {string_path}\n"
             )
-        return output
+        return "".join(parts)
 
-    def alert_view(self) -> str:
+    def alert_view(self) -> Tuple[bool, str]:
         """
-        Print method for nagios-compatible alert
+        Print method for nagios-compatible alert, returns whether any alert
+        fired along with the rendered output
         """
         errors = False
-        output = ""
+        parts = []
         for prefix, path in self.view["contents"].items():
             if prefix not in self.intent:
                 errors = True
-                output += f"Prefix {prefix} not found in intent file! "
+                parts.append(f"Prefix {prefix} not found in intent file! ")
                 continue
-            if self.intent[prefix] != path:
+            if self.intent[prefix] != frozenset(path):
                 errors = True
-                output += (
-                    f"Prefix {prefix} intent {self.intent[prefix]} does not "
+                parts.append(
+                    f"Prefix {prefix} intent {sorted(self.intent[prefix])} does not "
                     f"match reality {path}  "
                 )
         if not errors:
-            output += "No alerts!"
-        return f"[CRITICAL] {output}" if errors else f"[OK] {output}"
+            parts.append("No alerts!")
+        output = "".join(parts)
+        return errors, f"[CRITICAL] {output}" if errors else f"[OK] {output}"
 
     def normal_view(self) -> str:
         """
         Print method for normal
         """
-        output = ""
+        parts = []
+        peer_get = PEER_TRANSLATE.get
+        prefix_get = PREFIX_TRANSLATE.get
         for prefix, path in self.view["contents"].items():
-            string_path = ", ".join(
-                [PEER_TRANSLATE.get(path, str(path)) for path in path]
-            )
-            output += (
-                f"{PREFIX_TRANSLATE.get(prefix, prefix)} prefix found via next hop AS "
+            string_path = ", ".join([peer_get(asn, str(asn)) for asn in path])
+            parts.append(
+                f"{prefix_get(prefix, prefix)} prefix found via next hop AS "
                 f"{string_path}\n"
             )
-        return output
+        return "".join(parts)
 
 
 main = click.Group(help="Route Checker")
 
 
 @main.command()
-@click.argument("asn")
+@click.argument("asn", nargs=-1, required=True)
 @click.option("-S", "--slack", "channel", help="Post report to slack")
 @click.option(
     "-A",
@@ -283,7 +447,7 @@ main = click.Group(help="Route Checker")
     default="route_intent.yaml",
 )
 def show(
-    asn: str,
+    asn: Tuple[str, ...],
     output_type: OUTPUT_TYPES,
     channel: str,
     alerts_only: bool,
@@ -293,16 +457,18 @@ def show(
     """
     Show command for route-view. Displays various attributes of routes.
 
-    ASN: AS number of your organization
+    ASN: AS number(s) of your organization, queried in parallel
     """
 
-    def _parse_output(content: str, slack_func: Optional[Callable]):
+    def _parse_output(
+        content: str, slack_func: Optional[Callable], critical: bool = False
+    ):
         """
         Helper function to output message properly. Will send to slack if slack_func
         is not None, otherwise it will echo to stdout
         """
         if slack_func:
-            slack_func(content=content)
+            slack_func(content=content, critical=critical)
             return
         click.secho(content)
         return
@@ -310,7 +476,7 @@ def show(
     routes = RouteView(
         hostname=HOSTNAME,
         username=USERNAME,
-        asn=asn,
+        asns=asn,
         refresh=refresh,
         intent_file=intent_file,
     )
@@ -323,7 +489,8 @@ def show(
     elif output_type == "verbose":
         _parse_output(content=routes.verbose_view(), slack_func=to_slack)
     elif output_type == "alert":
-        _parse_output(content=routes.alert_view(), slack_func=to_slack)
+        critical, content = routes.alert_view()
+        _parse_output(content=content, slack_func=to_slack, critical=critical)
     else:
         _parse_output(content=routes.normal_view(), slack_func=to_slack)
 
@@ -0,0 +1,111 @@
+import re
+
+import route_check
+from route_check import RouteView
+
+PLAIN_OUTPUT = """\
+BGP table version is 295795479, local router ID is 128.223.51.103
+Status codes: s suppressed, d damped, h history, * valid, > best, i - internal,
+              r RIB-failure, S Stale, m multipath, b backup-path, f RT-Filter,
+              x best-external, a additional-path, c RIB-compressed,
+Origin codes: i - IGP, e - EGP, ? - incomplete
+
+   Network          Next Hop            Metric LocPrf Weight Path
+*  1.2.3.0/24       202.232.0.2                            0 2497 3356 1351 i
+*>                  12.0.1.63                              0 7018 3356 1351 i
+*  1.2.4.0/24       202.232.0.2              0             0 2497 6939 4826 ?
+*> 5.5.5.0/24       202.232.0.2                            0 1351 i
+
+Total number of prefixes 4
+"""
+
+RPKI_OUTPUT = """\
+BGP table version is 295795479, local router ID is 128.223.51.103
+Status codes: s suppressed, d damped, h history, * valid, > best, i - internal,
+              r RIB-failure, S Stale, m multipath, b backup-path, f RT-Filter,
+              x best-external, a additional-path, c RIB-compressed,
+Origin codes: i - IGP, e - EGP, ? - incomplete
+RPKI validation codes: V valid, I invalid, N Not found
+
+     Network          Next Hop            Metric LocPrf Weight Path
+N*   1.2.3.0/24       202.232.0.2                            0 2497 3356 1351 i
+N*>                   12.0.1.63                              0 7018 3356 1351 i
+V*   1.2.4.0/24       202.232.0.2              0             0 2497 6939 4826 ?
+N*>  5.5.5.0/24       202.232.0.2                            0 1351 i
+
+Total number of prefixes 4
+"""
+
+EXPECTED_ROWS = [
+    {"network": "1.2.3.0/24", "as_path": "2497 3356 1351"},
+    {"network": "1.2.3.0/24", "as_path": "7018 3356 1351"},
+    {"network": "1.2.4.0/24", "as_path": "2497 6939 4826"},
+    {"network": "5.5.5.0/24", "as_path": "1351"},
+]
+
+
+def test_parse_plain_output():
+    assert RouteView._parse_bgp_table(PLAIN_OUTPUT) == EXPECTED_ROWS
+
+
+def test_parse_rpki_output():
+    assert RouteView._parse_bgp_table(RPKI_OUTPUT) == EXPECTED_ROWS
+
+
+def test_rpki_rows_keep_full_first_as():
+    """
+    The validation code must not shift the path columns: a path of
+    '3356 1351' has to survive intact, not get clipped to '356 1351'.
+    """
+    rows = RouteView._parse_bgp_table(RPKI_OUTPUT)
+    pattern = re.compile(r"(\w+)\s+1351\b")
+    match = pattern.search(rows[0]["as_path"])
+    assert match and match.group(1) == "3356"
+
+
+def test_weight_excluded_when_asn_starts_path():
+    """
+    The weight column must not leak into the AS path, or a directly peered
+    ASN would pick up the weight as a bogus upstream AS.
+    """
+    rows = RouteView._parse_bgp_table(PLAIN_OUTPUT)
+    assert rows[3]["as_path"] == "1351"
+    assert not re.search(r"(\w+)\s+1351\b", rows[3]["as_path"])
+
+
+def _view_reader(tmp_path, monkeypatch, contents: bytes):
+    log = tmp_path / "route_view.log"
+    log.write_bytes(contents)
+    monkeypatch.setattr(route_check, "FILENAME", str(log))
+    return object.__new__(RouteView)._view_from_file()
+
+
+def test_view_from_file_reads_last_record(tmp_path, monkeypatch):
+    view = _view_reader(
+        tmp_path,
+        monkeypatch,
+        b'{"timestamp": "old", "contents": {}}\n'
+        b'{"timestamp": "new", "contents": {"1.2.3.0/24": [3356]}}\n',
+    )
+    assert view == {"timestamp": "new", "contents": {"1.2.3.0/24": [3356]}}
+
+
+def test_view_from_file_skips_torn_final_record(tmp_path, monkeypatch):
+    """
+    A crash mid-write leaves an unterminated tail; the reader must fall back
+    to the preceding complete record instead of crashing on the fragment.
+    """
+    view = _view_reader(
+        tmp_path,
+        monkeypatch,
+        b'{"timestamp": "old", "contents": {}}\n{"timestamp": "ne',
+    )
+    assert view == {"timestamp": "old", "contents": {}}
+
+
+def test_view_from_file_returns_none_when_no_complete_record(tmp_path, monkeypatch):
+    assert _view_reader(tmp_path, monkeypatch, b'{"timestamp": "ne') is None
+
+
+def test_view_from_file_returns_none_on_corrupt_record(tmp_path, monkeypatch):
+    assert _view_reader(tmp_path, monkeypatch, b"not json at all\n") is None